@@ -2,55 +2,132 @@
 
 __version__ = "0.2.3"
 
+import hashlib
+import io
 import json
+import os
+import shlex
+import shutil
+import signal
+import socket
+import struct
 import subprocess
-from pathlib import Path
-from typing import Final
-from zipfile import ZipFile
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from enum import Enum
+from functools import partial
+from pathlib import Path, PurePosixPath
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Callable,
+    ContextManager,
+    Final,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from zipfile import ZIP64_LIMIT, ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
 
-import fabric
 import typer
 
+if TYPE_CHECKING:
+    import fabric
+    import paramiko
+
 CONFIG_FILE_NAME: Final[str] = "odc.json"
 USERNAME: Final[str] = "username"
 PASSWORD: Final[str] = "password"
 HOSTNAME: Final[str] = "hostname"
 PORT: Final[str] = "port"
+_REQUIRED_KEYS: Final[Tuple[str, ...]] = (USERNAME, PASSWORD, HOSTNAME, PORT)
 
 APP_ZIP: Final[str] = "app.zip"
 DATA_ZIP: Final[str] = "data.zip"
 
+COPY_BUFFER_SIZE: Final[int] = 1024 * 1024
+SMALL_FILE_SIZE: Final[int] = 4096
+
+_CONFIG_PATH: Final[Path] = Path(CONFIG_FILE_NAME)
+_GITIGNORE: Final[Path] = Path(".gitignore")
+_POM: Final[Path] = Path("pom.xml")
+_MAIN_PY: Final[Path] = Path("main.py")
+_HOME: Final[Path] = Path("/home/")
+_DEFAULT_JAR: Final[Path] = Path("target/app.jar")
+_DEFAULT_PY_DIR: Final[Path] = Path("app")
+
+CACHE_DIR: Final[Path] = Path(".odc-cache")
+CACHE_MANIFEST: Final[Path] = CACHE_DIR / "manifest.json"
+_CACHE_LOCK = threading.Lock()
+
+_GITIGNORE_SNIPPET: Final[bytes] = (
+    f"\n# ODC Client\n{CONFIG_FILE_NAME}\n{CACHE_DIR}/\n".encode()
+)
+
+_CHUNK_HEADER: Final[struct.Struct] = struct.Struct("!I")
+
+# Opens a remote file for writing.
+RemoteOpener = Callable[[str], ContextManager[BinaryIO]]
+
+
+class Compression(str, Enum):
+    auto = "auto"
+    store = "store"
+    deflate = "deflate"
+    zstd = "zstd"
+
+
+# zstd support in zipfile was only added in Python 3.14.
+_COMPRESSION_METHODS: Final[dict] = {
+    Compression.store: ZIP_STORED,
+    Compression.deflate: ZIP_DEFLATED,
+    Compression.zstd: getattr(zipfile, "ZIP_ZSTANDARD", None),
+}
+
 app = typer.Typer()
 
+# The parsed config together with the mtime of the file it was read from.
+_CONFIG_CACHE: Optional[Tuple[int, dict]] = None
+
 
 def get_config() -> dict:
+    global _CONFIG_CACHE
+
     try:
-        with open(Path(CONFIG_FILE_NAME), "r") as f:
-            config = json.load(f)
+        f = open(_CONFIG_PATH, "r")
     except FileNotFoundError:
         print("Could not find config file. Don't forget to run `init`")
         raise typer.Exit(code=1)
 
-    if config.get(USERNAME) is None:
-        print("Could not find a username. Don't forget to run `init`")
-        raise typer.Exit(code=1)
+    with f:
+        mtime = os.fstat(f.fileno()).st_mtime_ns
+        if _CONFIG_CACHE is not None and _CONFIG_CACHE[0] == mtime:
+            return _CONFIG_CACHE[1]
 
-    if config.get(PASSWORD) is None:
-        print("Could not find a password. Don't forget to run `init`")
-        raise typer.Exit(code=1)
+        config = json.load(f)
 
-    if config.get(HOSTNAME) is None:
-        print("Could not find a hostname. Don't forget to run `init`")
-        raise typer.Exit(code=1)
-
-    if config.get(PORT) is None:
-        print("Could not find a port. Don't forget to run `init`")
+    missing = [key for key in _REQUIRED_KEYS if config.get(key) is None]
+    if missing:
+        for key in missing:
+            print(f"Could not find a {key}. Don't forget to run `init`")
         raise typer.Exit(code=1)
 
+    _CONFIG_CACHE = (mtime, config)
     return config
 
 
-def get_connection() -> fabric.Connection:
+def get_connection() -> "fabric.Connection":
+    # Importing fabric pulls in paramiko and cryptography, which is slow. Only pay
+    # that cost for commands that actually connect.
+    import fabric
+
     config = get_config()
     return fabric.Connection(
         host=config[HOSTNAME],
@@ -91,51 +168,588 @@ def init(
     command. As this file contains secrets, it is also added to the .gitignore if there
     is one present.
     """
-    config_file_path = Path(CONFIG_FILE_NAME)
-
-    if not force and config_file_path.is_file():
+    if not force and _CONFIG_PATH.is_file():
         raise typer.BadParameter(
-            f"File {config_file_path} already exists. Use the --force option to overwrite it."
+            f"File {_CONFIG_PATH} already exists. Use the --force option to overwrite it."
         )
 
     config = {USERNAME: username, PASSWORD: password, HOSTNAME: hostname, PORT: port}
 
-    with open(config_file_path, "w") as f:
+    with open(_CONFIG_PATH, "w") as f:
         json.dump(config, f, indent=2)
 
     if update_gitignore:
-        gitignore_path = Path(".gitignore")
-
-        if not gitignore_path.is_file():
+        # Without O_CREAT this fails instead of creating a .gitignore.
+        try:
+            fd = os.open(_GITIGNORE, os.O_WRONLY | os.O_APPEND)
+        except (FileNotFoundError, IsADirectoryError):
             print("No .gitignore found.")
             raise typer.Exit()
-        with open(gitignore_path, "a") as f:
-            f.write(f"\n# ODC Client\n{CONFIG_FILE_NAME}\n")
+        with open(fd, "wb", buffering=0) as f:
+            f.write(_GITIGNORE_SNIPPET)
 
 
 def build_jar(build_command: str):
     build_command = build_command.strip()
     print(f"Running `{build_command}`...")
-    result = subprocess.run(build_command.split(" "))
+    # Python opens fds as non-inheritable (PEP 446), so the build can't inherit e.g.
+    # the SSH connection that is being opened meanwhile. Closing them all is wasted
+    # work.
+    result = subprocess.run(
+        shlex.split(build_command), close_fds=False, stdin=subprocess.DEVNULL
+    )
 
     if result.returncode != 0:
         print("Failed to build package")
         raise typer.Exit(code=2)
 
 
-def zip_files(path: Path, zip_name: str, glob: str):
-    print(f"Zipping '{glob}' files in {path.resolve()}...")
-    with ZipFile(zip_name, "w") as app_zip:
-        for python_file in path.glob(glob):
-            app_zip.write(python_file, arcname=python_file.name)
+def check_jar(jar_path: Optional[Path]):
+    """Makes sure the jar exists before anything on the server is touched."""
+    if jar_path is not None and not os.path.isfile(jar_path):
+        print(f"Could not find the jar at {jar_path}")
+        raise typer.Exit(code=2)
+
+
+def deflate_to_cache(path: str) -> Tuple[int, int, str]:
+    """
+    Compresses the file at path to a raw DEFLATE stream in the CACHE_DIR. Returns the
+    CRC and size of the file and the sha1 of the stream, which is also its name.
+    """
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    sha1 = hashlib.sha1()
+    crc = 0
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=CACHE_DIR)
+    try:
+        with open(fd, "wb") as dst, open(path, "rb") as src:
+            while True:
+                chunk = src.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                data = compressor.compress(chunk)
+                sha1.update(data)
+                dst.write(data)
+
+            data = compressor.flush()
+            sha1.update(data)
+            dst.write(data)
+
+        # Moved into place only once complete, so an interrupted write never leaves a
+        # truncated blob behind that later runs would reuse.
+        os.replace(tmp_path, cache_blob(sha1.hexdigest()))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return crc, size, sha1.hexdigest()
 
 
-def zip_python(python_dir: Path = Path.cwd()):
-    zip_files(python_dir, APP_ZIP, "*.py")
+def cache_blob(sha1: str) -> Path:
+    return CACHE_DIR / f"{sha1}.deflate"
 
 
-def zip_data(data_dir: Path):
-    zip_files(data_dir, DATA_ZIP, "*.csv")
+def load_cache_manifest() -> dict:
+    try:
+        with open(CACHE_MANIFEST, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_cache_manifest(manifest: dict):
+    tmp_path = CACHE_MANIFEST.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, CACHE_MANIFEST)
+
+
+def prune_cache():
+    """
+    Removes manifest entries of files that no longer exist and the blobs that are no
+    longer referenced. This must not run while zips are being built, as their new
+    blobs may not be in the manifest yet.
+    """
+    if not CACHE_DIR.is_dir():
+        return
+
+    manifest = load_cache_manifest()
+    pruned = {path: entry for path, entry in manifest.items() if os.path.exists(path)}
+    if len(pruned) != len(manifest):
+        save_cache_manifest(pruned)
+
+    referenced = {entry["sha1"] for entry in pruned.values()}
+    for path in CACHE_DIR.iterdir():
+        # Also removes the temporary files of interrupted runs.
+        if path.suffix == ".tmp" or (
+            path.suffix == ".deflate" and path.stem not in referenced
+        ):
+            path.unlink()
+
+
+def deflate_files(
+    files: List[os.DirEntry],
+) -> Iterator[Tuple[os.DirEntry, int, int, str]]:
+    """
+    Yields each file with its CRC, its size and the sha1 of its cached DEFLATE stream,
+    in order. The streams are cached by path, mtime and size so unchanged files are not
+    compressed again.
+    """
+    manifest = load_cache_manifest()
+    keys = [os.path.realpath(file.path) for file in files]
+    stats = [file.stat() for file in files]
+    cached = []
+
+    for key, stat in zip(keys, stats):
+        entry = manifest.get(key)
+        if (
+            entry is None
+            or entry["mtime_ns"] != stat.st_mtime_ns
+            or entry["size"] != stat.st_size
+            or not cache_blob(entry["sha1"]).is_file()
+        ):
+            entry = None
+        cached.append(entry)
+
+    misses = [file.path for file, entry in zip(files, cached) if entry is None]
+    if not misses:
+        for file, entry in zip(files, cached):
+            yield file, entry["crc"], entry["size"], entry["sha1"]
+        return
+
+    CACHE_DIR.mkdir(exist_ok=True)
+    entries = {}
+
+    # zlib, crc32 and sha1 release the GIL on large buffers, so threads compress in
+    # parallel without the startup cost of worker processes.
+    with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(misses))) as pool:
+        compressed = pool.map(deflate_to_cache, misses)
+        try:
+            # Results are yielded as they come in so the zip is written while the
+            # remaining files are still being compressed.
+            for file, key, stat, entry in zip(files, keys, stats, cached):
+                if entry is None:
+                    crc, size, sha1 = next(compressed)
+                    entry = {
+                        "mtime_ns": stat.st_mtime_ns,
+                        "size": size,
+                        "sha1": sha1,
+                        "crc": crc,
+                    }
+                    entries[key] = entry
+                yield file, entry["crc"], entry["size"], entry["sha1"]
+        finally:
+            # Cancels the files that haven't started yet if the zip is abandoned.
+            compressed.close()
+
+    # The app and data zips are built concurrently, so the manifest is reloaded and
+    # replaced under a lock to not lose the entries of the other one.
+    with _CACHE_LOCK:
+        manifest = load_cache_manifest()
+        manifest.update(entries)
+        save_cache_manifest(manifest)
+
+
+def write_compressed(zip_file: ZipFile, info: ZipInfo, src: BinaryIO):
+    """
+    Writes an entry whose data is already compressed and read from src. The CRC,
+    file_size, compress_size and compress_type of info must already be set. ZipFile has
+    no public API for this, so the local file header is written by hand like
+    ZipFile.writestr does.
+    """
+    zip64 = info.file_size > ZIP64_LIMIT or info.compress_size > ZIP64_LIMIT
+
+    if zip_file._writing:
+        raise ValueError(
+            "Can't write to ZIP archive while an open writing handle exists."
+        )
+
+    with zip_file._lock:
+        zip_file._writecheck(info)
+        zip_file._didModify = True
+        info.header_offset = zip_file.fp.tell()
+        zip_file.fp.write(info.FileHeader(zip64))
+        shutil.copyfileobj(src, zip_file.fp, COPY_BUFFER_SIZE)
+        zip_file.filelist.append(info)
+        zip_file.NameToInfo[info.filename] = info
+        zip_file.start_dir = zip_file.fp.tell()
+
+
+def list_files(path: Path, suffix: str) -> List[os.DirEntry]:
+    with os.scandir(path) as it:
+        return [
+            entry for entry in it if entry.name.endswith(suffix) and entry.is_file()
+        ]
+
+
+def zip_info(file: os.DirEntry) -> ZipInfo:
+    """Like ZipInfo.from_file, but reuses the stat result cached by the DirEntry."""
+    stat = file.stat()
+    info = ZipInfo(file.name, time.localtime(stat.st_mtime)[:6])
+    info.external_attr = (stat.st_mode & 0xFFFF) << 16
+    info.file_size = stat.st_size
+    return info
+
+
+def zip_files(
+    path: Path, dest: BinaryIO, suffix: str, compression: Optional[int] = None
+):
+    """
+    Zips the files in path ending with suffix into dest. When compression is None,
+    small files are stored as they barely compress and the others are deflated.
+    """
+    print(f"Zipping '{suffix}' files in {path.resolve()}...")
+    streamed, deflated = [], []
+    for file in list_files(path, suffix):
+        if compression is not None:
+            method = compression
+        elif file.stat().st_size < SMALL_FILE_SIZE:
+            method = ZIP_STORED
+        else:
+            method = ZIP_DEFLATED
+
+        # Deflated entries go through the cache, the rest is compressed while writing.
+        if method == ZIP_DEFLATED:
+            deflated.append(file)
+        else:
+            streamed.append((file, method))
+
+    with ZipFile(dest, "w") as app_zip:
+        # A single buffer is reused for all files to avoid reallocating it per file.
+        buffer = memoryview(bytearray(COPY_BUFFER_SIZE))
+
+        for file, method in streamed:
+            info = zip_info(file)
+            info.compress_type = method
+
+            with open(file, "rb", buffering=0) as src, app_zip.open(info, "w") as dst:
+                while True:
+                    n = src.readinto(buffer)
+                    if not n:
+                        break
+                    dst.write(buffer[:n])
+
+        for file, crc, size, sha1 in deflate_files(deflated):
+            info = zip_info(file)
+            info.compress_type = ZIP_DEFLATED
+            info.CRC = crc
+            info.file_size = size
+
+            with open(cache_blob(sha1), "rb") as src:
+                info.compress_size = os.fstat(src.fileno()).st_size
+                write_compressed(app_zip, info, src)
+
+
+def zip_python(
+    dest: BinaryIO, python_dir: Path = Path(), compression: Optional[int] = None
+):
+    zip_files(python_dir, dest, ".py", compression)
+
+
+def zip_data(dest: BinaryIO, data_dir: Path, compression: Optional[int] = None):
+    zip_files(data_dir, dest, ".csv", compression)
+
+
+def copy_file(path: Path, dest: BinaryIO):
+    with open(path, "rb") as src:
+        shutil.copyfileobj(src, dest, COPY_BUFFER_SIZE)
+
+
+def _ignore_missing(f: Callable[..., None], *args):
+    try:
+        f(*args)
+    except IOError:
+        pass
+
+
+def _replace_remote(sftp: "paramiko.SFTPClient", src: str, dst: str):
+    """
+    Moves src to dst with plain renames, which don't overwrite. The previous dst is
+    moved aside first and put back if src can't be moved into place, in which case src
+    is removed.
+    """
+    backup = f"{dst}.old"
+    # Left behind if an earlier run was interrupted.
+    _ignore_missing(sftp.remove, backup)
+
+    try:
+        sftp.rename(dst, backup)
+    except IOError:
+        # There is no previous file.
+        backup = None
+
+    try:
+        sftp.rename(src, dst)
+    except BaseException:
+        if backup is not None:
+            _ignore_missing(sftp.rename, backup, dst)
+        _ignore_missing(sftp.remove, src)
+        raise
+
+    if backup is not None:
+        _ignore_missing(sftp.remove, backup)
+
+
+def sftp_opener(transport: "paramiko.Transport") -> RemoteOpener:
+    """
+    Returns a function that opens remote files for writing, each in its own SFTP
+    channel on the already authenticated transport.
+    """
+    import paramiko
+
+    @contextmanager
+    def open_remote(remote: str) -> Iterator[BinaryIO]:
+        # The file is only moved into place once it is complete, so a failed upload
+        # leaves the previous submission untouched.
+        tmp_remote = f"{remote}.part"
+        sftp = paramiko.SFTPClient.from_transport(transport)
+        try:
+            try:
+                with sftp.open(tmp_remote, "wb") as f:
+                    # Don't wait for the server to acknowledge each write.
+                    f.set_pipelined(True)
+                    yield f
+            except BaseException:
+                _ignore_missing(sftp.remove, tmp_remote)
+                raise
+
+            try:
+                sftp.posix_rename(tmp_remote, remote)
+            except IOError:
+                # Not every server supports the posix-rename extension.
+                _replace_remote(sftp, tmp_remote, remote)
+        finally:
+            sftp.close()
+
+    return open_remote
+
+
+class _ChunkWriter(io.RawIOBase):
+    """Sends everything written to it over sock as length prefixed chunks."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.sock.sendall(_CHUNK_HEADER.pack(len(b)))
+        self.sock.sendall(b)
+        return len(b)
+
+
+def _read_exact(f: BinaryIO, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise EOFError("Connection closed before the upload was complete")
+    return data
+
+
+def daemon_socket(config: dict) -> Path:
+    """
+    Returns the socket of the daemon for the server and account in config. This way
+    submit never uploads through a daemon that is connected elsewhere.
+    """
+    identity = f"{config[USERNAME]}@{config[HOSTNAME]}:{config[PORT]}"
+    digest = hashlib.sha1(identity.encode()).hexdigest()[:16]
+    return Path.home() / f".odc-client-{digest}.sock"
+
+
+def daemon_running(socket_path: Path) -> bool:
+    if not hasattr(socket, "AF_UNIX") or not socket_path.exists():
+        return False
+
+    with socket.socket(socket.AF_UNIX) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            return False
+
+    return True
+
+
+@contextmanager
+def daemon_open(socket_path: Path, remote: str) -> Iterator[BinaryIO]:
+    """
+    Opens remote for writing through the daemon. The data is sent in chunks followed by
+    an empty chunk, so the daemon can tell a complete upload from an aborted one.
+    """
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(str(socket_path))
+
+        try:
+            sock.sendall(json.dumps({"remote": remote}).encode() + b"\n")
+
+            with io.BufferedWriter(_ChunkWriter(sock), COPY_BUFFER_SIZE) as f:
+                yield f
+
+            sock.sendall(_CHUNK_HEADER.pack(0))
+        except ConnectionError:
+            # When the upload fails on its side, the daemon replies and closes the
+            # connection. The reply tells what went wrong.
+            pass
+
+        try:
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        except ConnectionError:
+            line = b""
+
+    reply = json.loads(line or '{"error": "No reply from the daemon"}')
+
+    if reply["error"] is not None:
+        print(f"The daemon failed to upload {remote}: {reply['error']}")
+        raise typer.Exit(code=3)
+
+
+def handle_daemon_client(conn: socket.socket, open_remote: RemoteOpener):
+    with conn, conn.makefile("rb") as f:
+        header = f.readline()
+        # daemon_running connects without sending anything.
+        if not header:
+            return
+
+        try:
+            # open_remote writes to a temporary name and only moves it into place when
+            # the block completes. That only happens once the empty chunk arrives; if
+            # the client goes away first, _read_exact raises and the partial upload is
+            # discarded.
+            with open_remote(json.loads(header)["remote"]) as dst:
+                while True:
+                    (size,) = _CHUNK_HEADER.unpack(_read_exact(f, _CHUNK_HEADER.size))
+                    if size == 0:
+                        break
+                    dst.write(_read_exact(f, size))
+        except Exception as e:
+            reply = {"error": str(e)}
+        else:
+            reply = {"error": None}
+
+        try:
+            conn.sendall(json.dumps(reply).encode() + b"\n")
+        except OSError:
+            pass
+
+
+def upload_file(
+    open_remote: RemoteOpener, remote: str, write: Callable[[BinaryIO], None]
+):
+    """
+    Opens remote for writing and passes it to write. This allows zips to be written
+    straight to the server without storing them locally first.
+    """
+    print(f"Uploading {PurePosixPath(remote).name}...")
+    with open_remote(remote) as f:
+        write(f)
+
+
+def upload_files(
+    open_remote: RemoteOpener,
+    remote_path: Path,
+    uploads: List[Tuple[str, Callable[[BinaryIO], None]]],
+):
+    """Uploads the (name, write) pairs concurrently to remote_path."""
+    with ThreadPoolExecutor(max_workers=len(uploads)) as pool:
+        futures = [
+            pool.submit(
+                upload_file, open_remote, (remote_path / name).as_posix(), write
+            )
+            for name, write in uploads
+        ]
+        for future in futures:
+            future.result()
+
+
+@app.command()
+def daemon(
+    detach: bool = typer.Option(
+        True, " /--foreground", help="Run the daemon in the background."
+    ),
+):
+    """
+    Starts a daemon that keeps a connection to the SFTP server open. While it is
+    running, `submit` uploads through it instead of connecting and authenticating
+    every time. It uses the odc.json of the directory it is started in, and submit
+    only uses it for projects with the same hostname, port and username.
+    """
+    if not hasattr(socket, "AF_UNIX") or not hasattr(os, "fork"):
+        print("The daemon is not supported on this platform.")
+        raise typer.Exit(code=1)
+
+    socket_path = daemon_socket(get_config())
+    if daemon_running(socket_path):
+        print(f"A daemon is already listening on {socket_path}.")
+        raise typer.Exit(code=1)
+
+    c = get_connection()
+
+    if detach:
+        # The child reports back over a pipe once it is connected and listening.
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(ready_write)
+            with os.fdopen(ready_read, "rb") as f:
+                if f.read() != b"1":
+                    print("Failed to start the daemon")
+                    raise typer.Exit(code=1)
+
+            print(f"Daemon started with pid {pid}. Stop it with `kill {pid}`.")
+            return
+
+        os.close(ready_read)
+        os.setsid()
+
+    print("Connecting to server...")
+    c.open()
+
+    if socket_path.exists():
+        socket_path.unlink()
+
+    server = socket.socket(socket.AF_UNIX)
+    # Only the current user may upload through the daemon.
+    umask = os.umask(0o177)
+    try:
+        server.bind(str(socket_path))
+    finally:
+        os.umask(umask)
+    server.listen()
+
+    lock = threading.Lock()
+
+    def open_remote(remote: str) -> ContextManager[BinaryIO]:
+        # The server may drop the connection while the daemon is idle.
+        with lock:
+            if not c.is_connected:
+                c.open()
+            return sftp_opener(c.client.get_transport())(remote)
+
+    # Make sure the socket is cleaned up when the daemon is killed.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    if detach:
+        os.write(ready_write, b"1")
+        os.close(ready_write)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+    else:
+        print(f"Listening on {socket_path}")
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(
+                target=handle_daemon_client, args=(conn, open_remote), daemon=True
+            ).start()
+    finally:
+        server.close()
+        socket_path.unlink()
+        c.close()
 
 
 @app.command()
@@ -152,19 +766,29 @@ def submit(
         "mvn clean package", help="The command to build the jar."
     ),
     jar_path: Path = typer.Option(
-        Path("target/app.jar"), help="The location of the compiled jar."
+        _DEFAULT_JAR, help="The location of the compiled jar."
     ),
     python_dir: Path = typer.Option(
-        Path("app"),
+        _DEFAULT_PY_DIR,
         help="The directory in which the main.py lives. "
         "If it does not exists, it is assumed that the files live in the root.",
     ),
-    data_path: Path = typer.Option(
-        Path.cwd(), help="The directory where the data files live."
+    data_path: Optional[Path] = typer.Option(
+        None,
+        exists=True,
+        file_okay=False,
+        help="The directory where the data files live. "
+        "Defaults to the current directory.",
     ),
     skip_data: bool = typer.Option(
         False, "--skip-data", help="Skip uploading the data files."
     ),
+    compression: Compression = typer.Option(
+        Compression.auto,
+        help="The compression method used for the zip files. "
+        "auto stores small files and deflates the others. "
+        "zstd requires Python 3.14 or newer.",
+    ),
 ):
     """
     Submit the project to the SFTP server. It automatically determines if it is a Java
@@ -174,39 +798,99 @@ def submit(
     Also supports uploading the data files. By default, it assumes that they live in the
     root of the directory.
     """
-    if Path("pom.xml").is_file():
-        print("Detected Java project")
-        if not skip_build:
-            build_jar(build_command)
+    if compression is Compression.auto:
+        compress_type = None
+    else:
+        compress_type = _COMPRESSION_METHODS[compression]
+        if compress_type is None:
+            raise typer.BadParameter(
+                f"{compression.value} compression is not supported by this Python "
+                "version."
+            )
 
-        submission = jar_path
-    elif python_dir.is_dir():
+    needs_build = False
+    jar = None
+
+    if os.path.isfile(_POM):
+        print("Detected Java project")
+        needs_build = not skip_build
+        jar = jar_path
+        uploads = [(jar_path.name, partial(copy_file, jar_path))]
+    elif os.path.isdir(python_dir):
         print(f"Detected Python project in {python_dir}")
-        zip_python(python_dir)
-        submission = APP_ZIP
-    elif Path("main.py").is_file():
+        uploads = [
+            (
+                APP_ZIP,
+                partial(zip_python, python_dir=python_dir, compression=compress_type),
+            )
+        ]
+    elif os.path.isfile(_MAIN_PY):
         print("Detected Python project")
-        zip_python()
-        submission = APP_ZIP
+        uploads = [(APP_ZIP, partial(zip_python, compression=compress_type))]
     else:
         print("Can't figure out what kind of project this is")
         raise typer.Abort()
 
+    # The zips are written directly to the server during the upload.
     if not skip_data:
-        zip_data(data_path)
-
-    remote_path = Path("/home/") / remote_dir
+        data_path = data_path or Path.cwd()
+        uploads.append(
+            (DATA_ZIP, partial(zip_data, data_dir=data_path, compression=compress_type))
+        )
 
-    with get_connection() as c:
-        print("Connecting to server...")
-        c.open()
-        print(f"Uploading {submission}...")
-        c.put(submission, remote=str(remote_path))
+    remote_path = _HOME / remote_dir
 
-        if not skip_data:
-            print(f"Uploading {DATA_ZIP}...")
-            c.put(DATA_ZIP, remote=str(remote_path))
+    # Only a daemon connected to the server and account in odc.json is used.
+    socket_path = daemon_socket(get_config())
+    if daemon_running(socket_path):
+        print("Uploading through the running daemon...")
+        if needs_build:
+            build_jar(build_command)
+        check_jar(jar)
+
+        upload_files(partial(daemon_open, socket_path), remote_path, uploads)
+        prune_cache()
+        print("Done!")
+        return
+
+    c = get_connection()
+    print("Connecting to server...")
+    # Authenticate in the background so it overlaps with building the jar. A daemon
+    # thread is used so a failed build exits right away instead of waiting for the
+    # connection, e.g. until a bad host times out.
+    connected = threading.Event()
+    connect_error: Optional[BaseException] = None
+
+    def connect():
+        nonlocal connect_error
+        try:
+            c.open()
+        except BaseException as e:
+            connect_error = e
+        finally:
+            connected.set()
+
+    threading.Thread(target=connect, daemon=True).start()
 
+    try:
+        if needs_build:
+            build_jar(build_command)
+        check_jar(jar)
+    except BaseException:
+        # Closing while c.open() still runs in the other thread would race with it.
+        # The process exits right after, which drops a half-open connection anyway.
+        if connected.is_set():
+            c.close()
+        raise
+
+    connected.wait()
+    if connect_error is not None:
+        raise connect_error
+
+    with c:
+        upload_files(sftp_opener(c.client.get_transport()), remote_path, uploads)
+
+    prune_cache()
     print("Done!")
 
 
@@ -0,0 +1,285 @@
+import io
+import os
+import socket
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+import pytest
+import typer
+
+import odc_client
+from odc_client import (
+    COPY_BUFFER_SIZE,
+    daemon_open,
+    handle_daemon_client,
+    write_compressed,
+    zip_files,
+)
+
+
+class Unseekable(io.RawIOBase):
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        return self.buffer.write(b)
+
+
+def deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+@pytest.mark.parametrize("seekable", [True, False])
+def test_write_compressed(seekable):
+    files = {"a.csv": b"a,b\n" * 10000, "b.csv": b"", "c.csv": os.urandom(5000)}
+    dest = io.BytesIO() if seekable else Unseekable()
+
+    with ZipFile(dest, "w") as zip_file:
+        zip_file.writestr("before.txt", b"before")
+        for name, data in files.items():
+            compressed = deflate(data)
+            info = ZipInfo(name)
+            info.compress_type = ZIP_DEFLATED
+            info.CRC = zlib.crc32(data)
+            info.file_size = len(data)
+            info.compress_size = len(compressed)
+            write_compressed(zip_file, info, io.BytesIO(compressed))
+        zip_file.writestr("after.txt", b"after")
+
+    raw = dest.getvalue() if seekable else dest.buffer.getvalue()
+    with ZipFile(io.BytesIO(raw)) as zip_file:
+        assert zip_file.testzip() is None
+        for name, data in files.items():
+            assert zip_file.read(name) == data
+        assert zip_file.read("before.txt") == b"before"
+        assert zip_file.read("after.txt") == b"after"
+
+
+@pytest.mark.parametrize("seekable", [True, False])
+def test_zip_files_auto(tmp_path, monkeypatch, seekable):
+    monkeypatch.chdir(tmp_path)
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    # Several large files that are compressed in parallel, and one small file that is
+    # stored.
+    files = {f"{i}.csv": f"{i},x\n".encode() * 5000 for i in range(5)}
+    files["small.csv"] = b"a,b\n"
+    for name, data in files.items():
+        (data_dir / name).write_bytes(data)
+        # Zips store times in two second steps.
+        os.utime(data_dir / name, (1700000000, 1700000000))
+    (data_dir / "ignored.txt").write_bytes(b"ignored")
+
+    # The second run reads everything from the cache.
+    for _ in range(2):
+        dest = io.BytesIO() if seekable else Unseekable()
+        zip_files(data_dir, dest, ".csv")
+
+        raw = dest.getvalue() if seekable else dest.buffer.getvalue()
+        with ZipFile(io.BytesIO(raw)) as zip_file:
+            assert zip_file.testzip() is None
+            assert sorted(zip_file.namelist()) == sorted(files)
+            for name, data in files.items():
+                assert zip_file.read(name) == data
+            assert zip_file.getinfo("small.csv").compress_type == ZIP_STORED
+            assert zip_file.getinfo("0.csv").compress_type == ZIP_DEFLATED
+            for name in files:
+                expected = ZipInfo.from_file(data_dir / name, arcname=name)
+                info = zip_file.getinfo(name)
+                assert info.date_time == expected.date_time
+                assert info.external_attr == expected.external_attr
+
+    assert len(odc_client.load_cache_manifest()) == 5
+
+
+@pytest.mark.parametrize("compression", [ZIP_STORED, ZIP_DEFLATED])
+def test_zip_files_single_method(tmp_path, monkeypatch, compression):
+    monkeypatch.chdir(tmp_path)
+    files = {"large.csv": b"a,b\n" * 5000, "small.csv": b"a,b\n"}
+    for name, data in files.items():
+        (tmp_path / name).write_bytes(data)
+
+    dest = io.BytesIO()
+    zip_files(tmp_path, dest, ".csv", compression)
+
+    with ZipFile(dest) as zip_file:
+        for name, data in files.items():
+            assert zip_file.read(name) == data
+            assert zip_file.getinfo(name).compress_type == compression
+
+
+class FakeSFTP:
+    """Plain renames that don't overwrite, like servers without posix-rename."""
+
+    def __init__(self, files, fail_rename_from=()):
+        self.files = files
+        self.fail_rename_from = fail_rename_from
+
+    def remove(self, path):
+        if path not in self.files:
+            raise IOError(path)
+        del self.files[path]
+
+    def rename(self, src, dst):
+        if src not in self.files or dst in self.files or src in self.fail_rename_from:
+            raise IOError(src)
+        self.files[dst] = self.files.pop(src)
+
+
+@pytest.mark.parametrize("previous", [True, False])
+def test_replace_remote(previous):
+    files = {"data.zip.part": b"new", "data.zip.old": b"stale"}
+    if previous:
+        files["data.zip"] = b"old"
+
+    odc_client._replace_remote(FakeSFTP(files), "data.zip.part", "data.zip")
+
+    assert files == {"data.zip": b"new"}
+
+
+def test_replace_remote_keeps_previous_on_failure():
+    files = {"data.zip.part": b"new", "data.zip": b"old"}
+
+    with pytest.raises(IOError):
+        odc_client._replace_remote(
+            FakeSFTP(files, fail_rename_from={"data.zip.part"}),
+            "data.zip.part",
+            "data.zip",
+        )
+
+    assert files == {"data.zip": b"old"}
+
+
+class Full(io.RawIOBase):
+    def writable(self):
+        return True
+
+    def write(self, b):
+        raise IOError("No space left on device")
+
+
+class FakeRemote:
+    """Keeps what is uploaded through open, unless the upload fails."""
+
+    def __init__(self, dst_class=io.BytesIO):
+        self.dst_class = dst_class
+        self.files = {}
+        self.discarded = []
+
+    @contextmanager
+    def open(self, remote):
+        dst = self.dst_class()
+        try:
+            yield dst
+        except BaseException:
+            self.discarded.append(remote)
+            raise
+        self.files[remote] = dst.getvalue()
+
+
+@contextmanager
+def serve_daemon(tmp_path, open_remote):
+    """Handles a single client like the daemon does."""
+    socket_path = tmp_path / "daemon.sock"
+    with socket.socket(socket.AF_UNIX) as server:
+        server.bind(str(socket_path))
+        server.listen()
+        thread = threading.Thread(
+            target=lambda: handle_daemon_client(server.accept()[0], open_remote)
+        )
+        thread.start()
+        try:
+            yield socket_path
+        finally:
+            thread.join(timeout=10)
+            assert not thread.is_alive()
+
+
+def test_daemon_upload(tmp_path):
+    data = os.urandom(3 * COPY_BUFFER_SIZE + 123)
+    remote = FakeRemote()
+
+    with serve_daemon(tmp_path, remote.open) as socket_path:
+        with daemon_open(socket_path, "/home/data.zip") as f:
+            # Both smaller and larger writes than the buffer.
+            f.write(data[:10])
+            f.write(data[10 : 2 * COPY_BUFFER_SIZE])
+            f.write(data[2 * COPY_BUFFER_SIZE :])
+
+    assert remote.files == {"/home/data.zip": data}
+    assert remote.discarded == []
+
+
+def test_daemon_upload_fails(tmp_path, capsys):
+    remote = FakeRemote(Full)
+
+    with serve_daemon(tmp_path, remote.open) as socket_path:
+        with pytest.raises(typer.Exit) as exc_info:
+            with daemon_open(socket_path, "/home/data.zip") as f:
+                # More than the socket buffers hold, so the client is still sending
+                # when the daemon gives up.
+                for _ in range(16):
+                    f.write(os.urandom(COPY_BUFFER_SIZE))
+
+    assert exc_info.value.exit_code == 3
+    assert "No space left on device" in capsys.readouterr().out
+    assert remote.discarded == ["/home/data.zip"]
+
+
+def test_daemon_upload_aborted(tmp_path):
+    remote = FakeRemote()
+
+    with serve_daemon(tmp_path, remote.open) as socket_path:
+        with pytest.raises(RuntimeError):
+            with daemon_open(socket_path, "/home/data.zip") as f:
+                f.write(os.urandom(2 * COPY_BUFFER_SIZE))
+                raise RuntimeError("Zipping failed")
+
+    assert remote.files == {}
+    assert remote.discarded == ["/home/data.zip"]
+
+
+def test_cache_invalidation_and_prune(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    first, second = data_dir / "first.csv", data_dir / "second.csv"
+    first.write_bytes(b"1,a\n" * 5000)
+    second.write_bytes(b"2,b\n" * 5000)
+
+    def zip_and_check(expected):
+        dest = io.BytesIO()
+        zip_files(data_dir, dest, ".csv", ZIP_DEFLATED)
+        with ZipFile(dest) as zip_file:
+            for path, data in expected.items():
+                assert zip_file.read(path.name) == data
+        manifest = odc_client.load_cache_manifest()
+        return {Path(key).name: entry["sha1"] for key, entry in manifest.items()}
+
+    old = zip_and_check({first: first.read_bytes(), second: second.read_bytes()})
+
+    # A new size, and the same size with a new mtime, are both compressed again.
+    first.write_bytes(b"1,a\n" * 6000)
+    second.write_bytes(b"2,c\n" * 5000)
+    stat = second.stat()
+    os.utime(second, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    new = zip_and_check({first: first.read_bytes(), second: second.read_bytes()})
+    assert new["first.csv"] != old["first.csv"]
+    assert new["second.csv"] != old["second.csv"]
+
+    second.unlink()
+    (odc_client.CACHE_DIR / "interrupted.tmp").write_bytes(b"")
+    odc_client.prune_cache()
+
+    manifest = odc_client.load_cache_manifest()
+    assert [Path(key).name for key in manifest] == ["first.csv"]
+    assert sorted(path.name for path in odc_client.CACHE_DIR.iterdir()) == sorted(
+        [f"{new['first.csv']}.deflate", odc_client.CACHE_MANIFEST.name]
+    )